@@ -0,0 +1,16 @@
+# Gunicorn settings for serving the app: gunicorn vedalipi_ml_pipeline:app
+# The pipeline is almost entirely waiting on Vision/Gemini, so each worker process serves many
+# requests concurrently on threads; a slow Gemini call or a long-lived /chatbot SSE stream then
+# occupies one thread rather than a whole worker.
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:3000')
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_WORKERS', 2))
+threads = int(os.getenv('WEB_THREADS', 32))
+
+# gthread workers heartbeat independently of requests, so this only reaps hung workers;
+# it must still exceed the longest Vision/Gemini call.
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
@@ -0,0 +1,30 @@
+# Image preprocessing run in the OCR worker processes.
+# Kept apart from vedalipi_ml_pipeline so the forkserver workers only import PIL,
+# not Flask, FAISS or the sentence-transformers model.
+import io
+import logging
+from PIL import Image, ImageOps
+
+OCR_MAX_DIMENSION = 2048  # Longest edge (px) sent to Vision; plenty for printed Devanagari
+OCR_JPEG_QUALITY = 85
+
+def preprocess_for_ocr(image):
+    """Downscale, grayscale and re-encode an image (bytes or file path) as JPEG to shrink the Vision API payload."""
+    try:
+        with Image.open(io.BytesIO(image) if isinstance(image, bytes) else image) as im:
+            im = ImageOps.exif_transpose(im)  # Bake in camera orientation before EXIF is dropped
+            im.thumbnail((OCR_MAX_DIMENSION, OCR_MAX_DIMENSION), Image.LANCZOS)
+            im = im.convert('L')
+            buf = io.BytesIO()
+            im.save(buf, 'JPEG', quality=OCR_JPEG_QUALITY, optimize=True)
+            return buf.getvalue()
+    except Exception as e:
+        logging.warning(f"Image preprocessing failed, sending original bytes: {e}")
+        if isinstance(image, bytes):
+            return image
+        with open(image, 'rb') as f:
+            return f.read()
+
+def ready():
+    """No-op submitted at startup so the worker processes are started before the first upload."""
+    return True
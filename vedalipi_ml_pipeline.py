@@ -1,12 +1,38 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, request, jsonify, Response, stream_with_context, session
 import base64
+import gzip
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import re
+import orjson
+import functools
+import collections
+import glob
+import zlib
+import hashlib
+import jmespath
+import threading
+import uuid
+import multiprocessing
+import time
 from indic_transliteration import sanscript
 from indic_transliteration.sanscript import transliterate
 import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dotenv import load_dotenv
 import os
+import shutil
+import tempfile
+import redis
+from pdf2image import convert_from_path
+import ocr_preprocess
+import diskcache
+import faiss
+from filelock import FileLock
+from sentence_transformers import SentenceTransformer
 
 # Load environment variables from .env file
 load_dotenv()
@@ -20,6 +46,8 @@ UPLOAD_FOLDER = 'uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+MAX_UPLOAD_BYTES = 32 * 1024 * 1024
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 
 # Load API keys from environment variables
 VISION_API_KEY = os.getenv('VISION_API_KEY')
@@ -30,745 +58,628 @@ if not all([VISION_API_KEY, GEMINI_API_KEY]):
     logging.error("One or more API keys are missing from the .env file.")
     raise ValueError("One or more API keys are missing from the .env file.")
 
-# Global variable to store the latest processed text
-global_context = {
-    'sanskrit_text': '',
-    'english_text': '',
-    'interpretation': ''
-}
+# API endpoints, built once. Keys travel in the x-goog-api-key header rather than the URL, so they
+# never appear in exception messages (which include the URL) that are relayed to the browser.
+VISION_URL = "https://vision.googleapis.com/v1/images:annotate"
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
+GEMINI_STREAM_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:streamGenerateContent?alt=sse"
+VISION_HEADERS = {'x-goog-api-key': VISION_API_KEY}
+GEMINI_HEADERS = {'x-goog-api-key': GEMINI_API_KEY}
+
+# (connect, read) timeouts in seconds, so a stalled connection cannot hold a worker indefinitely
+VISION_TIMEOUT = (5, 60)
+GEMINI_TIMEOUT = (5, 60)  # For streaming, the read timeout applies between chunks
+
+# Session cookie signing; must be shared by all workers so session IDs survive across them
+app.secret_key = os.getenv('FLASK_SECRET_KEY')
+if not app.secret_key:
+    logging.warning("FLASK_SECRET_KEY is not set; using a random key (sessions will not be shared across workers).")
+    app.secret_key = os.urandom(32)
+
+# Shared HTTP session so Vision/Gemini calls reuse pooled keep-alive connections
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=3,
+        read=0,  # Never resend after a read timeout: it would block for another full timeout and be billed again
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset(['POST']),  # Vision/Gemini calls are all read-only POSTs
+        raise_on_status=False  # Hand the final error response to the callers' own error handling
+    )
+)
+SESSION.mount('https://vision.googleapis.com', _adapter)
+SESSION.mount('https://generativelanguage.googleapis.com', _adapter)
+SESSION.headers.update({'Content-Type': 'application/json', 'Connection': 'keep-alive'})
+
+# Semantic response cache for Gemini calls
+SEMANTIC_CACHE_DIR = 'semantic_cache'
+SIMILARITY_THRESHOLD = 0.92
+SEMANTIC_CACHE_MAX_NAMESPACES = 64  # Documents whose index is kept in memory per process (LRU)
+SEMANTIC_CACHE_EXPIRE_SECONDS = 86400  # Namespaces not written for this long are deleted from disk
+SEMANTIC_CACHE_SWEEP_SECONDS = 3600
+SEMANTIC_CACHE_LOCK_STRIPES = 32
+
+class EmbeddingsManager:
+    """Lazily loads a sentence-transformers model and encodes text into normalized embeddings."""
+    def __init__(self, model_name='sentence-transformers/all-MiniLM-L6-v2'):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                logging.info(f"Loading embedding model {self.model_name}")
+                self._model = SentenceTransformer(self.model_name)
+            return self._model
+
+    @property
+    def dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        """Encode a list of texts into a float32 array of unit-length embeddings."""
+        return self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype('float32')
+
+class SemanticCache:
+    """Serves cached Gemini responses for prompts that are semantically close to earlier ones.
+
+    Entries are grouped into namespaces (e.g. one per manuscript context), each backed by a
+    FAISS inner-product index persisted under ``cache_dir``. Namespaces hash onto a fixed set of
+    lock stripes (a thread lock plus a lock file), so unrelated documents do not contend and
+    several worker processes can share the files; writes replace both files atomically. At most
+    ``SEMANTIC_CACHE_MAX_NAMESPACES`` namespaces stay in memory, and namespaces that have not been
+    written for ``SEMANTIC_CACHE_EXPIRE_SECONDS`` are swept from disk.
+    """
+    def __init__(self, embeddings, cache_dir, threshold=SIMILARITY_THRESHOLD):
+        self.embeddings = embeddings
+        self.cache_dir = cache_dir
+        self.threshold = threshold
+        self._namespaces = collections.OrderedDict()
+        self._namespaces_lock = threading.Lock()
+        self._stripe_locks = [threading.Lock() for _ in range(SEMANTIC_CACHE_LOCK_STRIPES)]
+        self._last_sweep = 0.0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, namespace):
+        base = os.path.join(self.cache_dir, namespace)
+        return f"{base}.index", f"{base}.json"
+
+    def _stripe(self, namespace):
+        """Return the (thread lock, lock file path) guarding a namespace."""
+        stripe = zlib.crc32(namespace.encode('utf-8')) % SEMANTIC_CACHE_LOCK_STRIPES
+        return self._stripe_locks[stripe], os.path.join(self.cache_dir, f".lock-{stripe}")
+
+    @staticmethod
+    def _version(index_path):
+        """Identify the on-disk index file; os.replace gives each write a new inode."""
+        try:
+            stat = os.stat(index_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _remember(self, namespace, entry):
+        """Record a loaded namespace as most recently used, evicting the least recently used."""
+        with self._namespaces_lock:
+            self._namespaces[namespace] = entry
+            self._namespaces.move_to_end(namespace)
+            while len(self._namespaces) > SEMANTIC_CACHE_MAX_NAMESPACES:
+                self._namespaces.popitem(last=False)
+
+    def _read(self, namespace):
+        """Load a namespace from disk into memory. Caller must hold the namespace's stripe locks."""
+        index_path, responses_path = self._paths(namespace)
+        index, responses = None, []
+        if os.path.exists(index_path) and os.path.exists(responses_path):
+            index = faiss.read_index(index_path)
+            with open(responses_path, encoding='utf-8') as f:
+                responses = json.load(f)
+            if len(responses) != index.ntotal:
+                logging.warning(f"Semantic cache '{namespace}' is inconsistent on disk; starting it afresh")
+                index, responses = None, []
+        if index is None:
+            index = faiss.IndexFlatIP(self.embeddings.dimension)
+        self._remember(namespace, (index, responses, self._version(index_path)))
+        return index, responses
+
+    def _current(self, namespace, lock_path):
+        """Return the in-memory namespace, reloading it if missing or written by another process since."""
+        index_path, _ = self._paths(namespace)
+        with self._namespaces_lock:
+            cached = self._namespaces.get(namespace)
+            if cached is not None:
+                self._namespaces.move_to_end(namespace)
+        if cached is None or cached[2] != self._version(index_path):
+            with FileLock(lock_path):
+                return self._read(namespace)
+        return cached[0], cached[1]
+
+    def lookup(self, namespace, text):
+        """Return (cached_response or None, embedding of text)."""
+        embedding = self.embeddings.encode([text])
+        stripe_lock, lock_path = self._stripe(namespace)
+        with stripe_lock:
+            index, responses = self._current(namespace, lock_path)
+            if index.ntotal == 0:
+                return None, embedding
+            scores, ids = index.search(embedding, 1)
+            if scores[0][0] > self.threshold and 0 <= ids[0][0] < len(responses):
+                logging.info(f"Semantic cache hit in '{namespace}' (score {scores[0][0]:.3f})")
+                return responses[ids[0][0]], embedding
+        return None, embedding
+
+    def store(self, namespace, embedding, response):
+        """Add a response for the given embedding and persist the namespace to disk."""
+        index_path, responses_path = self._paths(namespace)
+        stripe_lock, lock_path = self._stripe(namespace)
+        with stripe_lock, FileLock(lock_path):
+            # Re-read under the lock so entries written by other workers are kept
+            index, responses = self._read(namespace)
+            index.add(embedding)
+            responses.append(response)
+            with open(f"{responses_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(responses, f, ensure_ascii=False)
+            faiss.write_index(index, f"{index_path}.tmp")
+            os.replace(f"{responses_path}.tmp", responses_path)
+            os.replace(f"{index_path}.tmp", index_path)
+            self._remember(namespace, (index, responses, self._version(index_path)))
+        self._sweep_expired()
+
+    def _sweep_expired(self):
+        """Delete namespaces not written for SEMANTIC_CACHE_EXPIRE_SECONDS (at most once per sweep interval)."""
+        now = time.time()
+        with self._namespaces_lock:
+            if now - self._last_sweep < SEMANTIC_CACHE_SWEEP_SECONDS:
+                return
+            self._last_sweep = now
+        for index_path in glob.glob(os.path.join(self.cache_dir, '*.index')):
+            namespace = os.path.basename(index_path)[:-len('.index')]
+            stripe_lock, lock_path = self._stripe(namespace)
+            with stripe_lock, FileLock(lock_path):
+                try:
+                    if now - os.stat(index_path).st_mtime < SEMANTIC_CACHE_EXPIRE_SECONDS:
+                        continue
+                except FileNotFoundError:
+                    continue
+                for path in self._paths(namespace):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+            with self._namespaces_lock:
+                self._namespaces.pop(namespace, None)
+            logging.info(f"Expired semantic cache namespace '{namespace}'")
+
+EMBEDDINGS = EmbeddingsManager()
+SEMANTIC_CACHE = SemanticCache(EMBEDDINGS, SEMANTIC_CACHE_DIR)
+
+# Per-session document context for the chatbot, shared by all workers through Redis
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+CONTEXT_TTL_SECONDS = 3600
+CONTEXT_FIELDS = ('sanskrit_text', 'english_text', 'interpretation', 'summary')
+REDIS = redis.Redis(connection_pool=redis.ConnectionPool.from_url(REDIS_URL, max_connections=50, decode_responses=True))
+
+def get_session_id():
+    """Return the current browser session's ID, assigning one on first use."""
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+def save_context(session_id, context):
+    """Atomically replace a session's stored document context and refresh its expiry."""
+    key = f"ctx:{session_id}"
+    with REDIS.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.hset(key, mapping={field: context.get(field, '') for field in CONTEXT_FIELDS})
+        pipe.expire(key, CONTEXT_TTL_SECONDS)
+        pipe.execute()
+
+def load_context(session_id):
+    """Fetch a session's stored document context (empty fields if none)."""
+    stored = REDIS.hgetall(f"ctx:{session_id}")
+    return {field: stored.get(field, '') for field in CONTEXT_FIELDS}
 
 # Step 1: Extract text using Google Cloud Vision API
-def extract_text_from_image(image_content, language_hint="sa"):
-    """Extract Sanskrit text from an image using Google Cloud Vision API."""
-    try:
-        # Convert image to base64
-        encoded_image = base64.b64encode(image_content).decode('utf-8')
-        
-        # Prepare request to Google Cloud Vision API
-        request_data = {
-            "requests": [
-                {
-                    "image": {
-                        "content": encoded_image
-                    },
-                    "features": [
-                        {
-                            "type": "TEXT_DETECTION"
-                        }
-                    ],
-                    "imageContext": {
-                        "languageHints": [language_hint]  # 'sa' for Sanskrit
+VISION_BATCH_SIZE = 16  # Max images per images:annotate request
+VISION_MAX_REQUEST_BYTES = 8 * 1024 * 1024  # Headroom under Vision's 10 MB JSON request limit
+MAX_OCR_PAGES = 30  # Images/PDF pages OCR'd (and billed) per upload
+VISION_MAX_CONCURRENT_BATCHES = 4  # Caps in-flight Vision requests per upload so one large upload can't flood the project QPS
+VISION_BATCH_STAGGER_SECONDS = 0.05
+VISION_GZIP_LEVEL = 5  # Base64 payloads shrink ~25%; higher levels cost CPU for little extra gain
+
+VISION_FIELD_MASK = 'responses.fullTextAnnotation.text,responses.error'  # Skip per-word bounding polygons
+_VISION_TEXT = jmespath.compile('fullTextAnnotation.text')
+
+# Worker processes for CPU-bound image preprocessing, so PIL decode/encode runs outside the GIL.
+# Each gunicorn worker owns a pool, so keep it small rather than one process per core.
+PREPROC_WORKERS = int(os.getenv('PREPROC_WORKERS', 2))
+
+# forkserver children start from a clean process that has only imported ocr_preprocess, instead of
+# forking a threaded server holding Redis/HTTP connections and the embedding model
+_PREPROC_CONTEXT = multiprocessing.get_context('forkserver')
+_PREPROC_CONTEXT.set_forkserver_preload(['ocr_preprocess'])
+
+def _new_preproc_pool():
+    return ProcessPoolExecutor(max_workers=PREPROC_WORKERS, mp_context=_PREPROC_CONTEXT)
+
+_PREPROC_POOL_LOCK = threading.Lock()
+
+# Worker processes re-import this module when the app is run as a script, and must not start pools of their own
+PREPROC_POOL = None
+if multiprocessing.current_process().name == 'MainProcess':
+    PREPROC_POOL = _new_preproc_pool()
+    # Start the workers now so the first upload doesn't pay for process startup
+    for _ in range(PREPROC_WORKERS):
+        PREPROC_POOL.submit(ocr_preprocess.ready)
+
+def _preprocess_batch(batch):
+    """Preprocess a batch of images in the worker pool, replacing the pool if a worker has died."""
+    global PREPROC_POOL
+    for attempt in range(2):
+        pool = PREPROC_POOL
+        try:
+            return list(pool.map(ocr_preprocess.preprocess_for_ocr, batch))
+        except BrokenProcessPool:
+            # A dead worker (e.g. OOM-killed) breaks the executor for good; swap in a fresh one
+            logging.warning("Preprocessing pool is broken; replacing it")
+            with _PREPROC_POOL_LOCK:
+                if PREPROC_POOL is pool:
+                    PREPROC_POOL = _new_preproc_pool()
+            pool.shutdown(wait=False)
+            if attempt:
+                raise
+
+def _is_pdf(path):
+    """Check a saved upload's magic bytes for a PDF header."""
+    with open(path, 'rb') as f:
+        return f.read(4) == b'%PDF'
+
+def _pdf_to_page_images(pdf_path, output_folder, max_pages):
+    """Render up to max_pages pages of a PDF to PNG files in output_folder and return the paths in page order."""
+    return convert_from_path(pdf_path, output_folder=output_folder, fmt='png', paths_only=True, last_page=max_pages)
+
+def _vision_batches(image_contents):
+    """Group preprocessed images into annotate batches bounded by image count and request size."""
+    batch, batch_bytes = [], 0
+    for image_content in image_contents:
+        encoded_size = 4 * ((len(image_content) + 2) // 3)  # base64 length
+        if batch and (len(batch) == VISION_BATCH_SIZE or batch_bytes + encoded_size > VISION_MAX_REQUEST_BYTES):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(image_content)
+        batch_bytes += encoded_size
+    if batch:
+        yield batch
+
+def _annotate_batch(batch, language_hint):
+    """OCR one batch of preprocessed images with a single images:annotate call."""
+    # Prepare one base64-encoded annotate request per image
+    request_data = {
+        "requests": [
+            {
+                "image": {
+                    "content": base64.b64encode(image_content).decode('utf-8')
+                },
+                "features": [
+                    {
+                        "type": "DOCUMENT_TEXT_DETECTION"  # Dense-text model, better for Devanagari layout
                     }
+                ],
+                "imageContext": {
+                    "languageHints": [language_hint]  # 'sa' for Sanskrit
                 }
-            ]
-        }
-        
-        # Make the API request
-        vision_api_url = f"https://vision.googleapis.com/v1/images:annotate?key={VISION_API_KEY}"
-        response = requests.post(
-            vision_api_url,
-            data=json.dumps(request_data),
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        # Process the response
-        result = response.json()
-        
-        # Check for errors
-        if 'error' in result:
-            raise ValueError(f"Vision API error: {result['error']['message']}")
+            }
+            for image_content in batch
+        ]
+    }
+    
+    # Make the API request with a gzip-compressed body
+    response = SESSION.post(
+        VISION_URL,
+        data=gzip.compress(orjson.dumps(request_data), compresslevel=VISION_GZIP_LEVEL),
+        headers={**VISION_HEADERS, 'Content-Encoding': 'gzip', 'X-Goog-FieldMask': VISION_FIELD_MASK},
+        timeout=VISION_TIMEOUT
+    )
+    
+    # Process the response
+    result = orjson.loads(response.content)
+    
+    # Check for errors
+    if 'error' in result:
+        raise ValueError(f"Vision API error: {result['error']['message']}")
+    
+    # Extract text from each per-image response, keeping page order
+    page_texts = []
+    for page_result in result.get('responses', []):
+        if 'error' in page_result:
+            raise ValueError(f"Vision API error: {page_result['error']['message']}")
+        page_texts.append((_VISION_TEXT.search(page_result) or "").strip())
+    return page_texts
+
+def extract_text_from_images(images, language_hint="sa"):
+    """Extract Sanskrit text from one or more images (bytes or file paths) using batched Google Cloud Vision API calls."""
+    try:
+        # Shrink the images in the preprocessing pool, then split them into size-bounded batches
+        preprocessed = _preprocess_batch(images)
         
-        # Extract text from response
-        if (result.get('responses') and 
-            result['responses'][0].get('textAnnotations') and 
-            len(result['responses'][0]['textAnnotations']) > 0):
-            extracted_text = result['responses'][0]['textAnnotations'][0]['description']
+        batches = list(_vision_batches(preprocessed))
+        if not batches:
+            page_texts = []
+        elif len(batches) == 1:
+            # Common case: a single image or short PDF needs no thread hand-off
+            page_texts = _annotate_batch(batches[0], language_hint)
         else:
-            extracted_text = ""
+            # Fan out on a pool owned by this request, so concurrent uploads never queue behind each other
+            with ThreadPoolExecutor(max_workers=min(VISION_MAX_CONCURRENT_BATCHES, len(batches))) as pool:
+                futures = []
+                for batch_number, batch in enumerate(batches):
+                    # Stagger the first wave so their encode phases and uploads interleave; the sleep
+                    # happens here on the request thread rather than inside a pool slot
+                    if 0 < batch_number < VISION_MAX_CONCURRENT_BATCHES:
+                        time.sleep(VISION_BATCH_STAGGER_SECONDS)
+                    futures.append(pool.submit(_annotate_batch, batch, language_hint))
+                # Reassemble in page order
+                page_texts = [text for future in futures for text in future.result()]
         
+        extracted_text = "\n\n".join(text for text in page_texts if text)
         logging.info(f"Extracted text: {extracted_text}")
-        return extracted_text.strip()
+        return extracted_text
     except Exception as e:
         logging.error(f"Error during OCR: {e}")
         return None
 
 # Step 2: Transliterate and Translate to English using Gemini API
+# Devanagari -> IAST scheme map, built once instead of looked up on every call
+IAST_SCHEME_MAP = sanscript.SchemeMap(sanscript.SCHEMES[sanscript.DEVANAGARI], sanscript.SCHEMES[sanscript.IAST])
+
+def _strip_non_alpha(text):
+    """Drop everything except letters, spaces and hyphens.
+
+    Only the distinct characters are classified in Python; each unwanted one is then removed with a
+    C-level str.replace pass. An ASCII-only regex would be simpler but would also strip IAST diacritics.
+    """
+    for char in set(text):
+        if not (char.isalpha() or char in ' -'):
+            text = text.replace(char, '')
+    return text
+
+@functools.lru_cache(maxsize=4096)
 def transliterate_sanskrit(sanskrit_text):
     """Transliterate Sanskrit text from Devanagari to IAST with a sanity check."""
     try:
-        transliterated_text = transliterate(sanskrit_text, sanscript.DEVANAGARI, sanscript.IAST)
-        transliterated_text = ''.join(c for c in transliterated_text if c.isalpha() or c in ' -')
+        transliterated_text = transliterate(sanskrit_text, scheme_map=IAST_SCHEME_MAP)
+        transliterated_text = _strip_non_alpha(transliterated_text)
         return transliterated_text
     except Exception as e:
         logging.error(f"Error in transliterate_sanskrit: {str(e)}")
         raise
 
-def translate_to_english(text, source_language="sa", target_language="en"):
-    """Translate the text to English using Gemini API."""
+# On-disk memoization of deterministic Gemini results, shared across workers and restarts
+GEMINI_CACHE_DIR = 'interp_cache'
+GEMINI_CACHE_EXPIRE_SECONDS = 86400
+GEMINI_CACHE = diskcache.Cache(GEMINI_CACHE_DIR)
+
+# Shared Gemini API call: POST a prompt and return the first candidate's text
+_GEMINI_TEXT = jmespath.compile('candidates[0].content.parts[0].text')
+
+def _gemini_request(prompt, generation_config=None):
+    """Serialize a single-prompt Gemini request body."""
+    request_data = {"contents": [{"parts": [{"text": prompt}]}]}
+    if generation_config:
+        request_data["generationConfig"] = generation_config
+    return orjson.dumps(request_data)
+
+def _call_gemini(prompt, generation_config=None):
+    """Send a single prompt to the Gemini API and return the generated text ("" if none)."""
+    response = SESSION.post(
+        GEMINI_URL,
+        data=_gemini_request(prompt, generation_config),
+        headers=GEMINI_HEADERS,
+        timeout=GEMINI_TIMEOUT
+    )
+    result = orjson.loads(response.content)
+    
+    if 'error' in result:
+        raise ValueError(f"Gemini API error: {result['error']['message']}")
+    
+    return _GEMINI_TEXT.search(result) or ""
+
+# Steps 2 + 3 combined: Translate and interpret in a single Gemini API request
+TRANSLATE_AND_INTERPRET_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": {
+        "type": "OBJECT",
+        "properties": {
+            "translation": {"type": "STRING"},
+            "interpretation": {"type": "STRING"},
+            "summary": {"type": "STRING"}
+        },
+        "required": ["translation", "interpretation", "summary"]
+    }
+}
+
+class _IncompleteResult(Exception):
+    """Raised out of the memoized call to carry a fallback result that must not be cached."""
+    def __init__(self, result):
+        super().__init__("Incomplete Gemini response")
+        self.result = result
+
+@functools.lru_cache(maxsize=1024)
+@GEMINI_CACHE.memoize(name='translate_and_interpret:v2', expire=GEMINI_CACHE_EXPIRE_SECONDS)  # Bump name when the return shape changes
+def _translate_and_interpret(sanskrit_text):
+    """Memoized Gemini call; only complete results are returned (and cached), anything else raises."""
     try:
-        # Prepare the prompt for Gemini API
         prompt = (
-            f"Translate the following {source_language} text to {target_language}:\n"
-            f"Text: {text}\n"
-            f"Provide only the translated text in {target_language}."
-        )
-        
-        # Prepare the request to Gemini API
-        gemini_api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}"
-        request_data = {
-            "contents": [
-                {
-                    "parts": [
-                        {"text": prompt}
-                    ]
-                }
-            ]
-        }
-        
-        # Make the API request
-        response = requests.post(
-            gemini_api_url,
-            json=request_data,
-            headers={'Content-Type': 'application/json'}
+            f"The following is an excerpt from an ancient Sanskrit manuscript:\n"
+            f"Text: {sanskrit_text}\n\n"
+            f"Translate it to English. Then provide a concise summary (2-3 sentences) of the text and a brief "
+            f"contextual analysis (1-2 sentences) identifying if it contains spiritual, philosophical, or "
+            f"historical insights typical of Vedic literature. Finally, write a compact summary (at most 150 words) "
+            f"of the translation and interpretation that a chatbot can use as context for follow-up questions.\n"
+            f"Respond ONLY as JSON with keys 'translation', 'interpretation' and 'summary'."
         )
+        response_text = _call_gemini(prompt, TRANSLATE_AND_INTERPRET_CONFIG)
+        parsed = orjson.loads(response_text) if response_text else {}
         
-        # Process the response
-        result = response.json()
-        
-        # Check for errors
-        if 'error' in result:
-            raise ValueError(f"Gemini API error: {result['error']['message']}")
-        
-        # Extract the translated text
-        if (result.get('candidates') and 
-            len(result['candidates']) > 0 and 
-            result['candidates'][0].get('content') and 
-            result['candidates'][0]['content'].get('parts') and 
-            len(result['candidates'][0]['content']['parts']) > 0):
-            translated_text = result['candidates'][0]['content']['parts'][0]['text']
-        else:
-            translated_text = ""
-        
-        return translated_text.strip()
+        english_text = (parsed.get('translation') or "").strip()
+        if not english_text:
+            raise ValueError("Translation failed")
+        interpretation = (parsed.get('interpretation') or "").strip()
+        summary = (parsed.get('summary') or "").strip()
+        if not interpretation or not summary:
+            # Exceptions are never memoized, so the fallback reaches the user without being cached;
+            # an empty summary just makes the chatbot fall back to the full text
+            raise _IncompleteResult((english_text, interpretation or "Interpretation failed.", summary))
+        return english_text, interpretation, summary
+    except _IncompleteResult:
+        raise
     except Exception as e:
-        logging.error(f"Error in translate_to_english: {str(e)}")
+        logging.error(f"Error in translate_and_interpret: {str(e)}")
         raise
 
-# Step 3: Interpret the English Text using Gemini API
-def interpret_text(english_text):
-    """Interpret the translated English text using Gemini API."""
+def translate_and_interpret(sanskrit_text):
+    """Translate Sanskrit text to English, interpret it and summarize it for the chatbot with one Gemini API call."""
     try:
-        # Prepare the prompt for Gemini API
-        prompt = (
-            f"The following is a translated excerpt from an ancient Sanskrit manuscript:\n"
-            f"Text: {english_text}\n\n"
-            f"Provide a concise summary (2-3 sentences) of the text and a brief contextual analysis "
-            f"(1-2 sentences) identifying if it contains spiritual, philosophical, or historical insights typical of Vedic literature."
-        )
-        
-        # Prepare the request to Gemini API
-        gemini_api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}"
-        request_data = {
-            "contents": [
-                {
-                    "parts": [
-                        {"text": prompt}
-                    ]
-                }
-            ]
-        }
-        
-        # Make the API request
-        response = requests.post(
-            gemini_api_url,
-            json=request_data,
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        # Process the response
-        result = response.json()
-        
-        # Check for errors
-        if 'error' in result:
-            raise ValueError(f"Gemini API error: {result['error']['message']}")
-        
-        # Extract the interpretation
-        if (result.get('candidates') and 
-            len(result['candidates']) > 0 and 
-            result['candidates'][0].get('content') and 
-            result['candidates'][0]['content'].get('parts') and 
-            len(result['candidates'][0]['content']['parts']) > 0):
-            interpretation = result['candidates'][0]['content']['parts'][0]['text']
-        else:
-            interpretation = "Interpretation failed."
-        
-        return interpretation.strip()
-    except Exception as e:
-        logging.error(f"Error in interpret_text: {str(e)}")
-        raise
+        return _translate_and_interpret(sanskrit_text)
+    except _IncompleteResult as e:
+        logging.warning("Gemini returned an incomplete interpretation or summary; serving uncached fallback")
+        return e.result
 
 # Step 4: Chatbot using Gemini API
-def query_gemini_api(user_query):
-    """Send a query to the Gemini API with the stored context."""
-    try:
-        # Prepare the context for the Gemini API
-        context = (
-            f"The following is an excerpt from an ancient Sanskrit manuscript:\n"
-            f"Sanskrit Text: {global_context['sanskrit_text']}\n"
-            f"English Translation: {global_context['english_text']}\n"
-            f"Interpretation: {global_context['interpretation']}\n\n"
+CHAT_FULL_TEXT_QUERY_LENGTH = 100  # Long, detailed questions always get the full text
+CHAT_RELEVANCE_THRESHOLD = 0.5  # Query/sentence cosine similarity that pulls in the full text
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?;])\s+')
+
+@functools.lru_cache(maxsize=64)
+def _sentence_embeddings(english_text):
+    """Embed each sentence of a stored translation (cached per document)."""
+    sentences = [sentence for sentence in _SENTENCE_SPLIT.split(english_text) if sentence.strip()]
+    return EMBEDDINGS.encode(sentences) if sentences else None
+
+def _needs_full_text(user_query, query_embedding, english_text):
+    """Decide whether a query needs the full text or can be answered from the summary alone."""
+    if len(user_query) > CHAT_FULL_TEXT_QUERY_LENGTH:
+        return True
+    sentence_embeddings = _sentence_embeddings(english_text)
+    if sentence_embeddings is None:
+        return False
+    return float((sentence_embeddings @ query_embedding[0]).max()) > CHAT_RELEVANCE_THRESHOLD
+
+def _chat_cache_namespace(context):
+    """Semantic cache namespace for chatbot answers about one document."""
+    context_key = hashlib.sha256(
+        '\x1f'.join([context['sanskrit_text'], context['english_text'], context['interpretation']]).encode('utf-8')
+    ).hexdigest()[:16]
+    return f"chat-{context_key}"
+
+def _chat_prompt(user_query, query_embedding, context):
+    """Build the chatbot prompt, sending only the stored summary unless the query needs the full text."""
+    if context['summary'] and not _needs_full_text(user_query, query_embedding, context['english_text']):
+        return (
+            f"The following is a summary of an ancient Sanskrit manuscript:\n"
+            f"Summary: {context['summary']}\n\n"
             f"User Query: {user_query}"
         )
+    return (
+        f"The following is an excerpt from an ancient Sanskrit manuscript:\n"
+        f"Sanskrit Text: {context['sanskrit_text']}\n"
+        f"English Translation: {context['english_text']}\n"
+        f"Interpretation: {context['interpretation']}\n\n"
+        f"User Query: {user_query}"
+    )
+
+def query_gemini_api(user_query, session_id):
+    """Send a query to the Gemini API with the session's stored context."""
+    try:
+        # Serve paraphrased queries about the same document from the cache
+        stored_context = load_context(session_id)
+        cache_namespace = _chat_cache_namespace(stored_context)
+        cached, embedding = SEMANTIC_CACHE.lookup(cache_namespace, user_query)
+        if cached is not None:
+            return cached
         
-        # Prepare the request to Gemini API
-        gemini_api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}"
-        request_data = {
-            "contents": [
-                {
-                    "parts": [
-                        {"text": context}
-                    ]
-                }
-            ]
-        }
+        context = _chat_prompt(user_query, embedding, stored_context)
+        response_text = _call_gemini(context)
+        if not response_text:
+            return "Sorry, I couldn't generate a response."
         
-        # Make the API request
-        response = requests.post(
-            gemini_api_url,
-            json=request_data,
-            headers={'Content-Type': 'application/json'}
-        )
+        SEMANTIC_CACHE.store(cache_namespace, embedding, response_text)
+        return response_text
+    except Exception as e:
+        logging.error(f"Error in query_gemini_api: {str(e)}")
+        return f"Error: {str(e)}"
+
+def stream_gemini_api(user_query, session_id):
+    """Stream a chatbot answer from the Gemini API, yielding text chunks as they arrive."""
+    try:
+        # Serve paraphrased queries about the same document from the cache
+        stored_context = load_context(session_id)
+        cache_namespace = _chat_cache_namespace(stored_context)
+        cached, embedding = SEMANTIC_CACHE.lookup(cache_namespace, user_query)
+        if cached is not None:
+            yield cached
+            return
         
-        # Process the response
-        result = response.json()
+        context = _chat_prompt(user_query, embedding, stored_context)
         
-        # Check for errors
-        if 'error' in result:
-            raise ValueError(f"Gemini API error: {result['error']['message']}")
+        # Make the streaming API request and read the SSE frames as they arrive
+        chunks = []
+        with SESSION.post(GEMINI_STREAM_URL, data=_gemini_request(context), headers=GEMINI_HEADERS, stream=True, timeout=GEMINI_TIMEOUT) as response:
+            # Failed requests come back as a plain JSON error body rather than SSE frames
+            if not response.ok:
+                try:
+                    message = orjson.loads(response.content)['error']['message']
+                except (orjson.JSONDecodeError, KeyError, TypeError):
+                    response.raise_for_status()
+                raise ValueError(f"Gemini API error: {message}")
+            
+            # Iterate raw bytes: the stream declares no charset, so requests would decode it as ISO-8859-1
+            for line in response.iter_lines():
+                if not line.startswith(b'data:'):
+                    continue
+                result = orjson.loads(line[len(b'data:'):])
+                
+                if 'error' in result:
+                    raise ValueError(f"Gemini API error: {result['error']['message']}")
+                
+                chunk = _GEMINI_TEXT.search(result)
+                if chunk:
+                    chunks.append(chunk)
+                    yield chunk
         
-        # Extract the response text
-        if (result.get('candidates') and 
-            len(result['candidates']) > 0 and 
-            result['candidates'][0].get('content') and 
-            result['candidates'][0]['content'].get('parts') and 
-            len(result['candidates'][0]['content']['parts']) > 0):
-            response_text = result['candidates'][0]['content']['parts'][0]['text']
+        if chunks:
+            SEMANTIC_CACHE.store(cache_namespace, embedding, ''.join(chunks))
         else:
-            response_text = "Sorry, I couldn't generate a response."
-        
-        return response_text
+            yield "Sorry, I couldn't generate a response."
     except Exception as e:
-        logging.error(f"Error in query_gemini_api: {str(e)}")
-        return f"Error: {str(e)}"
+        logging.error(f"Error in stream_gemini_api: {str(e)}")
+        yield f"Error: {str(e)}"
 
 # Flask Routes
+# The landing page has no template variables, so it is read once and served pre-compressed
+with open(os.path.join(app.root_path, 'templates', 'index.html'), 'rb') as f:
+    INDEX_HTML = f.read()
+INDEX_HTML_GZ = gzip.compress(INDEX_HTML)
+INDEX_ETAG = hashlib.sha256(INDEX_HTML).hexdigest()[:16]
+
 @app.route('/')
 def index():
     """Render the main page with the upload form and sections."""
-    return render_template_string('''
-    <!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>VedaLipi - Ancient Script Translator</title>
-    <link href="https://fonts.googleapis.com/css2?family=Poppins:wght@400;600&family=Lora:wght@400;700&display=swap" rel="stylesheet">
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-            font-family: 'Poppins', sans-serif;
-        }
-        body {
-            background-color: #fff5e6;
-            color: #3c2f2f;
-        }
-        .navbar {
-            background: linear-gradient(to bottom, #ff9933, #e68a00);
-            padding: 20px 50px;
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            position: fixed;
-            width: 100%;
-            top: 0;
-            z-index: 1000;
-            box-shadow: 0 2px 10px rgba(0, 0, 0, 0.2);
-        }
-        .navbar .logo {
-            color: #ffd700;
-            font-family: 'Lora', serif;
-            font-size: 28px;
-            font-weight: 700;
-            text-shadow: 1px 1px 2px rgba(0, 0, 0, 0.3);
-        }
-        .navbar ul {
-            list-style: none;
-            display: flex;
-            gap: 30px;
-        }
-        .navbar ul li a {
-            color: #ffffff;
-            text-decoration: none;
-            font-size: 16px;
-            font-weight: 600;
-            transition: color 0.3s ease;
-        }
-        .navbar ul li a:hover {
-            color: #ffd700;
-        }
-        .section {
-            padding: 120px 50px;
-            min-height: 100vh;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            position: relative;
-        }
-        #home {
-            position: relative;
-            color: #ffffff;
-            text-align: center;
-            overflow: hidden;
-        }
-        #home video {
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            object-fit: cover;
-            z-index: 0;
-        }
-        #home::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(0, 0, 0, 0.3);
-            z-index: 1;
-        }
-        #home .upload-box {
-            position: relative;
-            z-index: 2;
-            background: rgba(255, 245, 230, 0.9);
-            padding: 40px;
-            border-radius: 15px;
-            box-shadow: 0 8px 30px rgba(0, 0, 0, 0.3);
-            max-width: 500px;
-            margin: 0 auto;
-            border: 2px solid #ffd700;
-        }
-        #home .upload-box h2 {
-            font-family: 'Lora', serif;
-            color: #3c2f2f;
-            margin-bottom: 20px;
-            font-size: 28px;
-        }
-        #home .upload-box p {
-            color: #3c2f2f;
-            margin-bottom: 20px;
-        }
-        #home .upload-box input[type="file"] {
-            display: none;
-        }
-        #home .upload-box label {
-            background: linear-gradient(to right, #ffd700, #ffcc00);
-            color: #3c2f2f;
-            padding: 12px 25px;
-            border-radius: 8px;
-            cursor: pointer;
-            font-weight: 600;
-            transition: transform 0.3s ease, box-shadow 0.3s ease;
-        }
-        #home .upload-box label:hover {
-            transform: scale(1.05);
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.3);
-        }
-        #translation {
-            background: url('https://mithunonthe.net/wp-content/uploads/2015/02/Hampi-Virupaksha-temple-ancient-ruins-royal-enclosure-architecture-photos-14.jpg') no-repeat center/cover;
-            display: flex;
-            flex-direction: column;
-            gap: 40px;
-            position: relative;
-        }
-        #translation::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(255, 245, 230, 0.8);
-            z-index: 1;
-        }
-        .translation-step {
-            position: relative;
-            z-index: 2;
-            background: rgba(255, 153, 51, 0.1);
-            padding: 30px;
-            border-radius: 15px;
-            box-shadow: 0 6px 20px rgba(0, 0, 0, 0.2);
-            max-width: 800px;
-            width: 100%;
-            text-align: center;
-            border-left: 5px solid #ffd700;
-        }
-        .translation-step h3 {
-            font-family: 'Lora', serif;
-            color: #3c2f2f;
-            margin-bottom: 15px;
-            font-size: 24px;
-        }
-        .translation-step p {
-            color: #4a3c31;
-            font-size: 16px;
-        }
-        #chatbot {
-            background: url('https://images.unsplash.com/photo-1545486336-5a3b6f7a1c7b?ixlib=rb-4.0.3&auto=format&fit=crop&w=1350&q=80') no-repeat center/cover;
-            color: #ffffff;
-            text-align: center;
-            position: relative;
-        }
-        #chatbot::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(0, 0, 0, 0.6);
-            z-index: 1;
-        }
-        .chatbot-container {
-            position: relative;
-            z-index: 2;
-            max-width: 600px;
-            width: 100%;
-            background: rgba(255, 245, 230, 0.95);
-            border-radius: 15px;
-            padding: 25px;
-            box-shadow: 0 8px 30px rgba(0, 0, 0, 0.3);
-            border: 2px solid #ff9933;
-        }
-        .chatbot-container h2 {
-            font-family: 'Lora', serif;
-            color: #3c2f2f;
-            margin-bottom: 20px;
-            font-size: 26px;
-        }
-        .chatbot-messages {
-            height: 300px;
-            overflow-y: auto;
-            background: #fff5e6;
-            border-radius: 8px;
-            padding: 15px;
-            margin-bottom: 20px;
-            border: 1px solid #ffd700;
-        }
-        .chatbot-messages p {
-            color: #3c2f2f;
-            margin-bottom: 10px;
-        }
-        .chatbot-messages .user-message {
-            text-align: right;
-            font-weight: 600;
-        }
-        .chatbot-messages .bot-message {
-            text-align: left;
-        }
-        .chatbot-input {
-            display: flex;
-            gap: 10px;
-        }
-        .chatbot-input input {
-            flex: 1;
-            padding: 12px;
-            border: 1px solid #ff9933;
-            border-radius: 8px;
-            font-size: 16px;
-            background: #fff;
-        }
-        .chatbot-input button {
-            background: linear-gradient(to right, #ffd700, #ffcc00);
-            color: #3c2f2f;
-            border: none;
-            padding: 12px 25px;
-            border-radius: 8px;
-            font-weight: 600;
-            cursor: pointer;
-            transition: transform 0.3s ease, box-shadow 0.3s ease;
-        }
-        .chatbot-input button:hover {
-            transform: scale(1.05);
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.3);
-        }
-        #recommendation {
-            background: url('https://images.unsplash.com/photo-1563984689740-f37ca8bc3c72?ixlib=rb-4.0.3&auto=format&fit=crop&w=1350&q=80') no-repeat center/cover;
-            display: flex;
-            gap: 40px;
-            padding: 50px;
-            position: relative;
-        }
-        #recommendation::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(255, 245, 230, 0.8);
-            z-index: 1;
-        }
-        .recommendation-sidebar {
-            position: relative;
-            z-index: 2;
-            flex: 1;
-            background: rgba(255, 153, 51, 0.1);
-            padding: 20px;
-            border-radius: 15px;
-            max-width: 300px;
-            border: 2px solid #ffd700;
-        }
-        .recommendation-sidebar h3 {
-            font-family: 'Lora', serif;
-            color: #3c2f2f;
-            margin-bottom: 20px;
-            font-size: 22px;
-        }
-        .image-list {
-            display: flex;
-            flex-direction: column;
-            gap: 15px;
-        }
-        .image-list img {
-            width: 100%;
-            height: 100px;
-            object-fit: cover;
-            border-radius: 8px;
-            cursor: pointer;
-            transition: transform 0.3s ease, box-shadow 0.3s ease;
-            border: 2px solid #ff9933;
-        }
-        .image-list img:hover {
-            transform: scale(1.05);
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.3);
-        }
-        .recommendation-content {
-            position: relative;
-            z-index: 2;
-            flex: 2;
-            background: rgba(255, 245, 230, 0.95);
-            padding: 30px;
-            border-radius: 15px;
-            box-shadow: 0 6px 20px rgba(0, 0, 0, 0.2);
-            border: 2px solid #ff9933;
-        }
-        .recommendation-content h2 {
-            font-family: 'Lora', serif;
-            color: #3c2f2f;
-            margin-bottom: 20px;
-            font-size: 26px;
-        }
-        .recommendation-content p {
-            color: #4a3c31;
-            font-size: 16px;
-        }
-        @media (max-width: 768px) {
-            .navbar {
-                flex-direction: column;
-                gap: 15px;
-                padding: 15px;
-            }
-            .navbar ul {
-                flex-direction: column;
-                gap: 15px;
-                text-align: center;
-            }
-            .section {
-                padding: 100px 20px;
-            }
-            #recommendation {
-                flex-direction: column;
-            }
-            .recommendation-sidebar, .recommendation-content {
-                max-width: 100%;
-            }
-            .upload-box, .translation-step, .chatbot-container {
-                padding: 20px;
-            }
-        }
-    </style>
-</head>
-<body>
-    <nav class="navbar">
-        <div class="logo">VedaLipi</div>
-        <ul>
-            <li><a href="#home">Home</a></li>
-            <li><a href="#translation">Translation</a></li>
-            <li><a href="#chatbot">Chatbot</a></li>
-            <li><a href="#recommendation">Recommendations</a></li>
-        </ul>
-    </nav>
-    <section id="home" class="section">
-        <video autoplay muted loop playsinline>
-            <source src="./static/video.mp4" type="video/mp4">
-            Your browser does not support the video tag.
-        </video>
-        <div class="upload-box">
-            <h2>Upload Ancient Script</h2>
-            <p>Begin your journey by uploading an ancient script dataset</p>
-            <form id="upload-form" enctype="multipart/form-data">
-                <input type="file" id="file-upload" name="file" accept=".pdf,.jpg,.png">
-                <label for="file-upload">Choose File</label>
-            </form>
-        </div>
-    </section>
-    <section id="translation" class="section">
-        <div class="translation-step">
-            <h3>Step 1: Raw Data to Text</h3>
-            <p id="sanskrit-text">Convert the uploaded ancient script into readable text format.</p>
-        </div>
-        <div class="translation-step">
-            <h3>Step 2: Translation to English</h3>
-            <p id="english-text">Translate the extracted text into English for better understanding.</p>
-        </div>
-        <div class="translation-step">
-            <h3>Step 3: Interpretation</h3>
-            <p id="interpretation-text">Interpret the translated text to uncover its meaning and context.</p>
-        </div>
-    </section>
-    <section id="chatbot" class="section">
-        <div class="chatbot-container">
-            <h2>Ask Our Ancient Script Expert</h2>
-            <div class="chatbot-messages" id="chatbot-messages">
-                <p class="bot-message">Welcome! Ask me anything about the translated script.</p>
-            </div>
-            <div class="chatbot-input">
-                <input type="text" id="chatbot-input" placeholder="Type your question...">
-                <button onclick="sendMessage()">Send</button>
-            </div>
-        </div>
-    </section>
-    <section id="recommendation" class="section">
-        <div class="recommendation-sidebar">
-            <h3>Recommended Scripts</h3>
-            <div class="image-list">
-                <img src="/static/sample1.jpg" alt="Vedic Manuscript" onclick="processRecommendedImage('/static/sample1.jpg', 'sample1.jpg')">
-                <img src="/static/sample2.jpg" alt="Tamil Grantha" onclick="processRecommendedImage('/static/sample2.jpg', 'sample2.jpg')">
-                <img src="/static/sample3.jpg" alt="Sanskrit Devanagari" onclick="processRecommendedImage('/static/sample3.jpg', 'sample3.jpg')">
-            </div>
-        </div>
-        <div class="recommendation-content">
-            <h2>Script Interpretation</h2>
-            <p>Select a script from the left to view its detailed interpretation here.</p>
-        </div>
-    </section>
-    <script>
-        // Handle image upload and processing
-        document.getElementById('file-upload').addEventListener('change', function() {
-            const formData = new FormData();
-            formData.append('file', this.files[0]);
-            fetch('/process', {
-                method: 'POST',
-                body: formData
-            })
-            .then(response => response.json())
-            .then(data => {
-                document.getElementById('sanskrit-text').innerText = data.sanskrit_text || 'No text extracted.';
-                document.getElementById('english-text').innerText = data.english_text || 'Translation failed.';
-                document.getElementById('interpretation-text').innerText = data.interpretation || 'Interpretation failed.';
-                window.location.hash = 'translation';
-            })
-            .catch(error => {
-                console.error('Error:', error);
-                alert('An error occurred while processing the image.');
-            });
-        });
-
-        // Handle recommended image processing
-        function processRecommendedImage(imageUrl, fileName) {
-            fetch(imageUrl)
-                .then(response => response.blob())
-                .then(blob => {
-                    const formData = new FormData();
-                    formData.append('file', blob, fileName);
-                    return fetch('/process', {
-                        method: 'POST',
-                        body: formData
-                    });
-                })
-                .then(response => response.json())
-                .then(data => {
-                    document.getElementById('sanskrit-text').innerText = data.sanskrit_text || 'No text extracted.';
-                    document.getElementById('english-text').innerText = data.english_text || 'Translation failed.';
-                    document.getElementById('interpretation-text').innerText = data.interpretation || 'Interpretation failed.';
-                    window.location.hash = 'translation';
-                })
-                .catch(error => {
-                    console.error('Error:', error);
-                    alert('An error occurred while processing the recommended image.');
-                });
-        }
-
-        // Handle chatbot messaging
-        function sendMessage() {
-            const input = document.getElementById('chatbot-input');
-            const message = input.value.trim();
-            if (!message) return;
-
-            // Display user message
-            const messagesDiv = document.getElementById('chatbot-messages');
-            const userMessage = document.createElement('p');
-            userMessage.className = 'user-message';
-            userMessage.innerText = message;
-            messagesDiv.appendChild(userMessage);
-
-            // Clear input
-            input.value = '';
-
-            // Send message to server
-            fetch('/chatbot', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({ message: message })
-            })
-            .then(response => response.json())
-            .then(data => {
-                // Display bot response
-                const botMessage = document.createElement('p');
-                botMessage.className = 'bot-message';
-                botMessage.innerText = data.response || 'Sorry, I couldn’t respond.';
-                messagesDiv.appendChild(botMessage);
-
-                // Scroll to the bottom
-                messagesDiv.scrollTop = messagesDiv.scrollHeight;
-            })
-            .catch(error => {
-                console.error('Error:', error);
-                const botMessage = document.createElement('p');
-                botMessage.className = 'bot-message';
-                botMessage.innerText = 'Error: Unable to get a response.';
-                messagesDiv.appendChild(botMessage);
-                messagesDiv.scrollTop = messagesDiv.scrollHeight;
-            });
-        }
-
-        // Allow pressing Enter to send message
-        document.getElementById('chatbot-input').addEventListener('keypress', function(e) {
-            if (e.key === 'Enter') {
-                sendMessage();
-            }
-        });
-    </script>
-</body>
-</html>
-    ''')
+    if request.accept_encodings['gzip']:
+        response = Response(INDEX_HTML_GZ, mimetype='text/html')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(f"{INDEX_ETAG}-gz")
+    else:
+        response = Response(INDEX_HTML, mimetype='text/html')
+        response.set_etag(INDEX_ETAG)
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response.make_conditional(request)
 
 @app.route('/process', methods=['POST'])
 def process_image():
@@ -777,33 +688,51 @@ def process_image():
         logging.error("No file part in the request")
         return jsonify({'error': 'No file uploaded'}), 400
     
-    file = request.files['file']
-    if file.filename == '':
+    files = request.files.getlist('file')
+    if not files or any(file.filename == '' for file in files):
         logging.error("No selected file")
         return jsonify({'error': 'No file selected'}), 400
+    if len(files) > MAX_OCR_PAGES:
+        logging.error(f"Too many files uploaded: {len(files)}")
+        return jsonify({'error': f'Upload at most {MAX_OCR_PAGES} files at a time'}), 400
     
     try:
-        # Read the image file directly into memory
-        image_content = file.read()
-        
-        # Step 1: Extract text using Google Cloud Vision API
-        sanskrit_text = extract_text_from_image(image_content)
+        # Spool the uploads to disk instead of reading them into memory, splitting PDFs into one image per page
+        work_dir = tempfile.mkdtemp(dir=app.config['UPLOAD_FOLDER'])
+        try:
+            image_paths = []
+            for i, file in enumerate(files):
+                upload_path = os.path.join(work_dir, f"upload-{i}")
+                file.save(upload_path)
+                if _is_pdf(upload_path):
+                    # Render only what the per-upload page budget has left, keeping one page for each remaining file
+                    page_budget = MAX_OCR_PAGES - len(image_paths) - (len(files) - i - 1)
+                    image_paths.extend(_pdf_to_page_images(upload_path, work_dir, page_budget))
+                else:
+                    image_paths.append(upload_path)
+            
+            # Step 1: Extract text using Google Cloud Vision API
+            sanskrit_text = extract_text_from_images(image_paths)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
         if sanskrit_text is None or sanskrit_text == "":
             raise ValueError("Text extraction failed")
         
-        # Step 2: Transliterate and translate using Gemini API
+        # Step 2: Transliterate locally
         transliterated_text = transliterate_sanskrit(sanskrit_text)
-        english_text = translate_to_english(sanskrit_text)  # Now uses Gemini API
+        
+        # Steps 2 + 3: Translate and interpret with one Gemini API call
+        english_text, interpretation, summary = translate_and_interpret(sanskrit_text)
         if not english_text:
             raise ValueError("Translation failed")
         
-        # Step 3: Interpret the translated text using Gemini API
-        interpretation = interpret_text(english_text)
-        
-        # Store the results in global context for the chatbot
-        global_context['sanskrit_text'] = sanskrit_text
-        global_context['english_text'] = english_text
-        global_context['interpretation'] = interpretation
+        # Store the results in the session's context for the chatbot
+        save_context(get_session_id(), {
+            'sanskrit_text': sanskrit_text,
+            'english_text': english_text,
+            'interpretation': interpretation,
+            'summary': summary
+        })
         
         return jsonify({
             'sanskrit_text': sanskrit_text,
@@ -814,6 +743,11 @@ def process_image():
         logging.error(f"Error in process_image: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.errorhandler(413)
+def upload_too_large(e):
+    """Report oversized uploads as JSON, like the other /process errors."""
+    return jsonify({'error': f'Upload exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit'}), 413
+
 @app.route('/chatbot', methods=['POST'])
 def chatbot():
     """Handle chatbot queries using the Gemini API."""
@@ -823,12 +757,31 @@ def chatbot():
             return jsonify({'error': 'No message provided'}), 400
         
         user_query = data['message']
-        response = query_gemini_api(user_query)
+        response = query_gemini_api(user_query, get_session_id())
         
         return jsonify({'response': response})
     except Exception as e:
         logging.error(f"Error in chatbot: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/chatbot', methods=['GET'])
+def chatbot_stream():
+    """Stream chatbot answers to the browser as Server-Sent Events."""
+    user_query = request.args.get('message', '').strip()
+    if not user_query:
+        return jsonify({'error': 'No message provided'}), 400
+    session_id = get_session_id()
+    
+    def generate():
+        for chunk in stream_gemini_api(user_query, session_id):
+            yield f"data: {orjson.dumps({'text': chunk}).decode('utf-8')}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=3000)
\ No newline at end of file